@@ -72,25 +72,29 @@ export const useWebSocket = ({
             return;
           }
 
-          // Handle JSON message (pause detection)
-          const data = JSON.parse(event.data);
-
-          if (data.hasOwnProperty('is_there_a_pause')) {
-            if (data.is_there_a_pause) {
-              onStatusUpdate("paused");
-              // Use actual transcription from backend
-              if (data.transcription && data.transcription.trim()) {
-                onRecommendations([data.transcription]);
+          // Handle JSON message (pause detection); the server may coalesce
+          // several pending messages into a single {"batch": [...]} frame
+          const parsed = JSON.parse(event.data);
+          const messages = Array.isArray(parsed.batch) ? parsed.batch : [parsed];
+
+          for (const data of messages) {
+            if (data.hasOwnProperty('is_there_a_pause')) {
+              if (data.is_there_a_pause) {
+                onStatusUpdate("paused");
+                // Use actual transcription from backend
+                if (data.transcription && data.transcription.trim()) {
+                  onRecommendations([data.transcription]);
+                }
+              } else {
+                onStatusUpdate("listening");
+                // Also handle regular transcription updates
+                if (data.transcription && data.transcription.trim()) {
+                  onRecommendations([data.transcription]);
+                }
               }
             } else {
-              onStatusUpdate("listening");
-              // Also handle regular transcription updates
-              if (data.transcription && data.transcription.trim()) {
-                onRecommendations([data.transcription]);
-              }
+              console.log('Unknown message format:', data);
             }
-          } else {
-            console.log('Unknown message format:', data);
           }
         } catch (err) {
           console.error('Error parsing WebSocket message:', err);
@@ -27,6 +27,9 @@ def check_lull_thread(processor: LiveVADProcessor, stop_event: threading.Event):
     print("Started lull checking thread...")
     
     while not stop_event.is_set():
+        # Sleep until a silence flag flips (or a second passes) instead of polling
+        processor.wait_for_silence_change(timeout=1.0)
+        
         # Check silence flags using the processor
         silence_500ms, silence_2000ms = processor.get_silence_flags()
         _, speech_flag = processor.get_current_vad_result()
@@ -38,9 +41,6 @@ def check_lull_thread(processor: LiveVADProcessor, stop_event: threading.Event):
             print("  🤫 Short pause detected (0.5s+) - Monitoring...")
         elif speech_flag:
             print("  🗣️  Active speech detected")
-        
-        # Wait a bit before checking again
-        time.sleep(0.5)
     
     print("Lull checking thread stopped.")
 
@@ -10,16 +10,27 @@ import threading
 import queue
 import time
 import signal
-from collections import deque
+from collections import deque, namedtuple
 
 # Add TEN VAD to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../include")))
 
 import numpy as np
-import pyaudio
+from shared_mic import SharedMic
 from ten_vad import TenVad
 
 
+VADSnapshot = namedtuple(
+    'VADSnapshot',
+    [
+        'frames_processed', 'elapsed_time', 'fps', 'queue_size',
+        'last_probability', 'last_speech_flag',
+        'silence_500ms', 'silence_2000ms',
+        'buffer_500ms_ready', 'buffer_2000ms_ready',
+    ]
+)
+
+
 class SilenceDetector:
     """Thread-safe silence detector that tracks speech activity over time windows."""
     
@@ -28,9 +39,17 @@ class SilenceDetector:
         self.frames_500ms = int(500 / hop_size_ms)  # ~31 frames for 0.5 seconds
         self.frames_2000ms = int(2000 / hop_size_ms)  # ~125 frames for 2 seconds
         
-        # Thread-safe deques for tracking recent speech flags
-        self.recent_flags_500ms = deque(maxlen=self.frames_500ms)
-        self.recent_flags_2000ms = deque(maxlen=self.frames_2000ms)
+        # Single ring buffer covering the 2s window; the 0.5s window is its tail.
+        # Sized to the next power of two so the index wraps with a bitmask.
+        ring_size = 1 << (self.frames_2000ms - 1).bit_length()
+        self._ring_mask = ring_size - 1
+        self.buf2000 = [0] * ring_size
+        self._pos = 0
+        self._filled = 0
+        
+        # Running speech counts over each window
+        self._count_500ms = 0
+        self._count_2000ms = 0
         
         # Thread lock for safe access
         self._lock = threading.Lock()
@@ -38,35 +57,108 @@ class SilenceDetector:
         # Current silence flags
         self._silence_500ms = False
         self._silence_2000ms = False
+        
+        # (frame_count, probability, speech_flag) of the frame behind the current flags
+        self._last_result = (0, 0.0, 0)
+        
+        # Bumped (and waiters notified) whenever either silence flag changes value.
+        # A counter rather than an Event so one waiter can't clear another's signal.
+        self._state_changed = threading.Condition(self._lock)
+        self._change_count = 0
     
-    def update(self, speech_flag):
-        """Thread-safe update with new speech flag."""
+    def update(self, speech_flag, result=None):
+        """
+        Thread-safe update with new speech flag.
+        
+        Args:
+            speech_flag: Whether the frame contained speech
+            result: Optional (frame_count, probability, speech_flag) for the frame,
+                published under the same lock as the flags it produced
+        """
+        speech_flag = 1 if speech_flag else 0
+        mask = self._ring_mask
         with self._lock:
-            self.recent_flags_500ms.append(speech_flag)
-            self.recent_flags_2000ms.append(speech_flag)
+            pos = self._pos
+            filled = self._filled
+            buf = self.buf2000
+            
+            # Values leaving each window sit frames_Xms slots behind the write position
+            if filled >= self.frames_2000ms:
+                self._count_2000ms -= buf[(pos - self.frames_2000ms) & mask]
+            if filled >= self.frames_500ms:
+                self._count_500ms -= buf[(pos - self.frames_500ms) & mask]
+            
+            if result is not None:
+                self._last_result = result
+            
+            buf[pos] = speech_flag
+            self._count_500ms += speech_flag
+            self._count_2000ms += speech_flag
+            
+            self._pos = (pos + 1) & mask
+            if filled < self.frames_2000ms:
+                self._filled = filled = filled + 1
             
             # Update silence flags
-            if len(self.recent_flags_500ms) >= self.frames_500ms:
-                self._silence_500ms = sum(self.recent_flags_500ms) == 0
+            changed = False
+            if filled >= self.frames_500ms:
+                silence_500ms = self._count_500ms == 0
+                changed = silence_500ms != self._silence_500ms
+                self._silence_500ms = silence_500ms
+            
+            if filled >= self.frames_2000ms:
+                silence_2000ms = self._count_2000ms == 0
+                changed = changed or silence_2000ms != self._silence_2000ms
+                self._silence_2000ms = silence_2000ms
             
-            if len(self.recent_flags_2000ms) >= self.frames_2000ms:
-                self._silence_2000ms = sum(self.recent_flags_2000ms) == 0
+            if changed:
+                self._change_count += 1
+                self._state_changed.notify_all()
     
     def get_flags(self):
         """Thread-safe getter for silence flags."""
         with self._lock:
             return self._silence_500ms, self._silence_2000ms
     
+    def wait_for_change(self, timeout=None):
+        """
+        Block until a silence flag changes after this call, or the timeout expires.
+        
+        Returns:
+            True if a flag changed, False on timeout
+        """
+        with self._state_changed:
+            seen = self._change_count
+            return self._state_changed.wait_for(lambda: self._change_count != seen, timeout)
+    
+    def snapshot(self):
+        """
+        Read all silence state under a single lock acquisition.
+        
+        Returns:
+            (last_result, silence_500ms, silence_2000ms, buffer_500ms_ready, buffer_2000ms_ready),
+            where last_result is the tuple most recently passed to update()
+        """
+        with self._lock:
+            filled = self._filled
+            return (
+                self._last_result,
+                self._silence_500ms,
+                self._silence_2000ms,
+                filled >= self.frames_500ms,
+                filled >= self.frames_2000ms,
+            )
+    
     def get_status(self):
         """Get detailed status information."""
         with self._lock:
             return {
                 'silence_500ms': self._silence_500ms,
                 'silence_2000ms': self._silence_2000ms,
-                'buffer_500ms_size': len(self.recent_flags_500ms),
-                'buffer_2000ms_size': len(self.recent_flags_2000ms),
-                'buffer_500ms_ready': len(self.recent_flags_500ms) >= self.frames_500ms,
-                'buffer_2000ms_ready': len(self.recent_flags_2000ms) >= self.frames_2000ms
+                'buffer_500ms_size': min(self._filled, self.frames_500ms),
+                'buffer_2000ms_size': self._filled,
+                'buffer_500ms_ready': self._filled >= self.frames_500ms,
+                'buffer_2000ms_ready': self._filled >= self.frames_2000ms
             }
 
 
@@ -90,65 +182,127 @@ class LiveVADProcessor:
         self.ten_vad = TenVad(hop_size, threshold)
         self.silence_detector = SilenceDetector(hop_size_ms=16)
         
+        # Energy gate: frames below the noise floor skip the neural VAD.
+        # Starts at ~100 RMS on the int16 scale and adapts to the room: the floor
+        # is a windowed minimum of non-speech frame energy (kept as per-block
+        # minima), times a margin. Speech and its loud pauses can't raise it
+        # because the minimum over the window is set by the quietest frames.
+        # Never below ~10 RMS, so digital silence can't switch the gate off.
+        self._noise_floor = hop_size * 100.0 ** 2
+        self._noise_floor_min = hop_size * 10.0 ** 2
+        self._noise_floor_margin = 2.0
+        self._noise_block_frames = 32  # ~0.5 s of 16 ms frames per block
+        self._noise_block_mins = deque(maxlen=8)  # ~4 s window
+        self._noise_block_min = float("inf")
+        self._noise_block_count = 0
+        
         # Audio streaming
         self.audio_queue = queue.Queue(maxsize=100)
-        self.pyaudio = pyaudio.PyAudio()
-        self.stream = None
+        self.mic = None
+        
+        # Samples after the last full hop of a buffer, carried into the next
+        # callback (the shared stream's buffer size may not be a multiple of hop_size)
+        self._pending = np.empty(0, dtype=np.int16)
         
         # Threading
         self.processing_thread = None
         self.running = False
         
-        # Statistics
-        self.frame_count = 0
+        # Statistics, published as one (frame_count, probability, speech_flag)
+        # tuple so readers never see fields from different frames
         self.start_time = None
-        self.last_speech_probability = 0.0
-        self.last_speech_flag = 0
-    
-    def _audio_callback(self, in_data, frame_count, time_info, status):
-        """PyAudio callback for incoming audio data."""
-        if status:
-            print(f"Audio callback status: {status}")
+        self._last_result = (0, 0.0, 0)
         
+        # (frame_count, flags) of the last get_silence_flags() call
+        self._flags_cache = (-1, (False, False))
+    
+    def _audio_callback(self, in_data):
+        """Shared microphone consumer for incoming audio data."""
         # Convert bytes to numpy array
         audio_data = np.frombuffer(in_data, dtype=np.int16)
+        if len(self._pending):
+            audio_data = np.concatenate((self._pending, audio_data))
         
-        # Add to processing queue
-        try:
-            self.audio_queue.put(audio_data, block=False)
-        except queue.Full:
-            pass  # Drop frame if queue is full
-        
-        return (None, pyaudio.paContinue)
+        # The shared stream may deliver several hops per buffer; queue them one by one
+        hop_size = self.hop_size
+        end = len(audio_data) - len(audio_data) % hop_size
+        for start in range(0, end, hop_size):
+            try:
+                self.audio_queue.put(audio_data[start:start + hop_size], block=False)
+            except queue.Full:
+                pass  # Drop frame if queue is full
+        self._pending = audio_data[end:]
     
     def _process_audio_thread(self):
         """Audio processing thread - runs VAD and updates silence detector."""
+        # Bind hot-path callables once; this loop runs for every 16ms frame
+        get_chunk = self.audio_queue.get
+        vad_process = self.ten_vad.process
+        update_silence = self.silence_detector.update
+        hop_size = self.hop_size
+        frame_count = self._last_result[0]
+        
         while self.running:
             try:
                 # Get audio chunk from queue
-                audio_chunk = self.audio_queue.get(timeout=0.1)
+                audio_chunk = get_chunk(timeout=0.1)
                 
                 # Ensure we have exactly hop_size samples
-                if len(audio_chunk) >= self.hop_size:
-                    # Take first hop_size samples
-                    frame_data = audio_chunk[:self.hop_size]
+                if len(audio_chunk) >= hop_size:
+                    # Take first hop_size samples (a view, no copy)
+                    frame_data = audio_chunk[:hop_size]
                     
-                    # Process with VAD
-                    probability, speech_flag = self.ten_vad.process(frame_data)
+                    # Cheap energy check first; only run the VAD on non-silent frames.
+                    # Gated frames never reach TenVad, so its recurrent state skips
+                    # them - it resumes from the last frame it actually processed.
+                    samples = frame_data.astype(np.float64)
+                    energy = float(np.dot(samples, samples))
+                    if energy < self._noise_floor:
+                        probability, speech_flag = 0.0, 0
+                    else:
+                        probability, speech_flag = vad_process(frame_data)
                     
-                    # Update silence detector
-                    self.silence_detector.update(speech_flag)
+                    if not speech_flag:
+                        self._update_noise_floor(energy)
                     
-                    # Update statistics
-                    self.frame_count += 1
-                    self.last_speech_probability = probability
-                    self.last_speech_flag = speech_flag
+                    # Publish the result with the silence flags it produces, then
+                    # the lock-free copy for per-frame readers (single reference swap)
+                    frame_count += 1
+                    result = (frame_count, probability, speech_flag)
+                    update_silence(speech_flag, result)
+                    self._last_result = result
                 
             except queue.Empty:
                 continue
             except Exception as e:
                 print(f"Error in audio processing: {e}")
     
+    def _update_noise_floor(self, energy):
+        """
+        Fold a non-speech frame's energy into the windowed minimum.
+        
+        Every non-speech frame counts toward the window. The floor drops as
+        soon as a quieter frame arrives, and otherwise follows the window's
+        minimum once a full window has been seen, so it rises again after a
+        momentary dip (e.g. a muted mic) once the room is back to normal.
+        """
+        if energy < self._noise_block_min:
+            self._noise_block_min = energy
+        self._noise_block_count += 1
+        
+        floor = max(energy * self._noise_floor_margin, self._noise_floor_min)
+        if floor < self._noise_floor:
+            self._noise_floor = floor
+        
+        if self._noise_block_count >= self._noise_block_frames:
+            self._noise_block_mins.append(self._noise_block_min)
+            self._noise_block_min = float("inf")
+            self._noise_block_count = 0
+            if len(self._noise_block_mins) == self._noise_block_mins.maxlen:
+                self._noise_floor = max(
+                    min(self._noise_block_mins) * self._noise_floor_margin, self._noise_floor_min
+                )
+    
     def start(self):
         """Start microphone capture and processing."""
         print("Starting live VAD processor...")
@@ -156,22 +310,19 @@ class LiveVADProcessor:
         
         self.running = True
         self.start_time = time.time()
+        self._pending = np.empty(0, dtype=np.int16)
         
         # Start audio processing thread
         self.processing_thread = threading.Thread(target=self._process_audio_thread, daemon=True)
         self.processing_thread.start()
         
-        # Start microphone stream
-        self.stream = self.pyaudio.open(
-            format=pyaudio.paInt16,
+        # Attach to the shared microphone stream
+        self.mic = SharedMic.instance(
+            sample_rate=self.sample_rate,
             channels=1,  # Mono
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.hop_size,
-            stream_callback=self._audio_callback
+            frames_per_buffer=self.hop_size
         )
-        
-        self.stream.start_stream()
+        self.mic.register(self._audio_callback)
         print("Microphone stream started. Listening...")
     
     def stop(self):
@@ -179,44 +330,83 @@ class LiveVADProcessor:
         print("Stopping live VAD processor...")
         self.running = False
         
-        # Stop audio stream
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
+        # Detach from the shared microphone (closes it if we were the last consumer)
+        if self.mic:
+            self.mic.unregister(self._audio_callback)
+            self.mic = None
         
         # Wait for processing thread
         if self.processing_thread:
             self.processing_thread.join(timeout=1.0)
         
-        # Cleanup PyAudio
-        self.pyaudio.terminate()
         print("Stopped.")
     
     def get_silence_flags(self):
-        """Get current silence detection flags."""
-        return self.silence_detector.get_flags()
+        """
+        Get current silence detection flags.
+        
+        The flags only change when a frame is processed, so repeated calls
+        within one hop reuse the cached value instead of taking the lock.
+        """
+        # Read the frame count before the flags so a cached entry is never older than its key
+        frame_count = self._last_result[0]
+        cached_frame, flags = self._flags_cache
+        if cached_frame != frame_count:
+            flags = self.silence_detector.get_flags()
+            self._flags_cache = (frame_count, flags)
+        return flags
+    
+    def wait_for_silence_change(self, timeout=None):
+        """Block until a silence flag changes or the timeout expires."""
+        return self.silence_detector.wait_for_change(timeout)
+    
+    @property
+    def frame_count(self):
+        """Number of frames processed so far."""
+        return self._last_result[0]
     
     def get_current_vad_result(self):
         """Get the most recent VAD result."""
-        return self.last_speech_probability, self.last_speech_flag
+        _, probability, speech_flag = self._last_result
+        return probability, speech_flag
+    
+    def snapshot(self):
+        """Get a consistent VADSnapshot of processor and silence state."""
+        (
+            (frame_count, probability, speech_flag),
+            silence_500ms, silence_2000ms, ready_500ms, ready_2000ms,
+        ) = self.silence_detector.snapshot()
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        
+        return VADSnapshot(
+            frames_processed=frame_count,
+            elapsed_time=elapsed,
+            fps=frame_count / elapsed if elapsed > 0 else 0,
+            queue_size=self.audio_queue.qsize(),
+            last_probability=probability,
+            last_speech_flag=speech_flag,
+            silence_500ms=silence_500ms,
+            silence_2000ms=silence_2000ms,
+            buffer_500ms_ready=ready_500ms,
+            buffer_2000ms_ready=ready_2000ms
+        )
     
     def get_detailed_status(self):
         """Get comprehensive status information."""
-        elapsed = time.time() - self.start_time if self.start_time else 0
-        silence_status = self.silence_detector.get_status()
+        snap = self.snapshot()
         
         return {
-            'frames_processed': self.frame_count,
-            'elapsed_time': elapsed,
-            'fps': self.frame_count / elapsed if elapsed > 0 else 0,
-            'queue_size': self.audio_queue.qsize(),
-            'last_probability': self.last_speech_probability,
-            'last_speech_flag': self.last_speech_flag,
-            'silence_500ms': silence_status['silence_500ms'],
-            'silence_2000ms': silence_status['silence_2000ms'],
+            'frames_processed': snap.frames_processed,
+            'elapsed_time': snap.elapsed_time,
+            'fps': snap.fps,
+            'queue_size': snap.queue_size,
+            'last_probability': snap.last_probability,
+            'last_speech_flag': snap.last_speech_flag,
+            'silence_500ms': snap.silence_500ms,
+            'silence_2000ms': snap.silence_2000ms,
             'buffers_ready': {
-                '500ms': silence_status['buffer_500ms_ready'],
-                '2000ms': silence_status['buffer_2000ms_ready']
+                '500ms': snap.buffer_500ms_ready,
+                '2000ms': snap.buffer_2000ms_ready
             }
         }
 
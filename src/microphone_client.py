@@ -17,12 +17,13 @@ Usage:
 import asyncio
 import websockets
 import json
-import pyaudio
 import threading
 import signal
 import sys
 from datetime import datetime
 
+from shared_mic import SharedMic
+
 
 class MicrophoneStreamer:
     def __init__(
@@ -40,12 +41,17 @@ class MicrophoneStreamer:
         self.chunk_size = chunk_size
 
         # Audio setup
-        self.audio = pyaudio.PyAudio()
-        self.stream = None
+        self.mic = None
+        self._loop = None
+        self._pending_audio = bytearray()
+        self._chunk_bytes = chunk_size * channels * 2  # 16-bit samples
 
         # WebSocket
         self.websocket = None
 
+        # Transcription output file, kept open for the session
+        self._out_fh = None
+
         # Control flags
         self.running = False
         self.audio_queue = asyncio.Queue()
@@ -59,29 +65,32 @@ class MicrophoneStreamer:
         print("\n🛑 Stopping microphone streaming...")
         self.running = False
 
-    def audio_callback(self, in_data, frame_count, time_info, status):
-        """Callback for audio input."""
-        if self.running:
-            # Put audio data in queue for async processing
+    def audio_callback(self, in_data):
+        """Shared microphone consumer; batches buffers up to `chunk_size` frames."""
+        if not self.running:
+            return
+
+        self._pending_audio += in_data
+        if len(self._pending_audio) >= self._chunk_bytes:
+            chunk = bytes(self._pending_audio)
+            self._pending_audio.clear()
+            # Called from the PortAudio thread, so hand off to the event loop safely
             try:
-                asyncio.create_task(self.audio_queue.put(in_data))
+                self._loop.call_soon_threadsafe(self.audio_queue.put_nowait, chunk)
             except RuntimeError:
-                # Handle case where event loop isn't running
+                # Handle case where event loop has been closed
                 pass
-        return (None, pyaudio.paContinue)
 
     async def setup_audio(self):
         """Setup audio input stream."""
         print(f"🎤 Setting up microphone (Sample Rate: {self.sample_rate}Hz, Channels: {self.channels})")
 
         try:
-            self.stream = self.audio.open(
-                format=pyaudio.paInt16,
+            self._loop = asyncio.get_running_loop()
+            self.mic = SharedMic.instance(
+                sample_rate=self.sample_rate,
                 channels=self.channels,
-                rate=self.sample_rate,
-                input=True,
-                frames_per_buffer=self.chunk_size,
-                stream_callback=self.audio_callback
+                frames_per_buffer=self.chunk_size
             )
             print("✅ Microphone setup complete")
             return True
@@ -91,18 +100,18 @@ class MicrophoneStreamer:
 
     def cleanup_audio(self):
         """Clean up audio resources."""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-        if self.audio:
-            self.audio.terminate()
+        if self.mic:
+            self.mic.unregister(self.audio_callback)
+            self.mic = None
+        if self._out_fh:
+            self._out_fh.close()
+            self._out_fh = None
 
     async def write_transcription(self, text):
         """Write transcription to file with timestamp."""
         try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(self.output_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{timestamp}] {text}\n")
+            self._out_fh.write(f"[{timestamp}] {text}\n".encode('utf-8'))
             print(f"📝 Saved to {self.output_file}: {text}")
         except Exception as e:
             print(f"❌ Error writing to file: {e}")
@@ -127,11 +136,7 @@ class MicrophoneStreamer:
         """Receive messages from WebSocket."""
         while self.running:
             try:
-                if not self.websocket:
-                    await asyncio.sleep(0.1)
-                    continue
-
-                # Receive JSON response
+                # Receive JSON response (the socket is connected before this task starts)
                 message = await asyncio.wait_for(self.websocket.recv(), timeout=0.5)
 
                 if isinstance(message, str):
@@ -190,10 +195,11 @@ class MicrophoneStreamer:
                 # Clear output file
                 with open(self.output_file, 'w') as f:
                     f.write(f"# Live Speech-to-Text Session Started: {datetime.now()}\n\n")
+                self._out_fh = open(self.output_file, 'ab', buffering=0)
 
                 # Start audio stream
-                self.stream.start_stream()
                 self.running = True
+                self.mic.register(self.audio_callback)
 
                 # Run sender and receiver concurrently
                 await asyncio.gather(
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Shared microphone capture.
+
+Opens a single PyAudio input stream and fans each captured buffer out to every
+registered consumer, so the VAD processor and the streaming client can run
+side by side without opening the device twice.
+"""
+
+import threading
+
+import pyaudio
+
+
+class SharedMic:
+    """Process-wide microphone stream that dispatches raw int16 buffers to consumers."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, sample_rate=16000, channels=1, frames_per_buffer=256):
+        """
+        Initialize the shared microphone (use `SharedMic.instance()` instead).
+
+        Args:
+            sample_rate: Audio sample rate in Hz
+            channels: Number of input channels
+            frames_per_buffer: Frames delivered to consumers per callback
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+
+        self._pyaudio = None
+        self._stream = None
+        self._consumers = ()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls, sample_rate=16000, channels=1, frames_per_buffer=256):
+        """
+        Return the shared microphone, creating it on first use.
+
+        `frames_per_buffer` only applies to the call that creates the stream;
+        later callers receive buffers of the original size and must not assume
+        it matches their own request.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(sample_rate, channels, frames_per_buffer)
+            elif (cls._instance.sample_rate, cls._instance.channels) != (sample_rate, channels):
+                raise ValueError(
+                    f"Shared microphone already open at {cls._instance.sample_rate}Hz/"
+                    f"{cls._instance.channels}ch, requested {sample_rate}Hz/{channels}ch"
+                )
+            return cls._instance
+
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        """PyAudio callback - hands the same buffer to every consumer."""
+        if status:
+            print(f"Audio callback status: {status}")
+
+        for consumer in self._consumers:
+            consumer(in_data)
+
+        return (None, pyaudio.paContinue)
+
+    def register(self, consumer):
+        """
+        Register a consumer and open the stream if it is not running yet.
+
+        Args:
+            consumer: Callable taking the raw int16 `bytes` of each buffer.
+                Called from the PortAudio thread, so it must not block.
+        """
+        with self._lock:
+            # Swap in a new tuple so the callback never iterates a mutating container
+            self._consumers = self._consumers + (consumer,)
+
+            if self._stream is None:
+                self._pyaudio = pyaudio.PyAudio()
+                self._stream = self._pyaudio.open(
+                    format=pyaudio.paInt16,
+                    channels=self.channels,
+                    rate=self.sample_rate,
+                    input=True,
+                    frames_per_buffer=self.frames_per_buffer,
+                    stream_callback=self._audio_callback,
+                )
+                self._stream.start_stream()
+
+    def unregister(self, consumer):
+        """Remove a consumer, closing the stream once nobody is listening."""
+        with self._lock:
+            self._consumers = tuple(c for c in self._consumers if c != consumer)
+
+            if not self._consumers and self._stream is not None:
+                self._stream.stop_stream()
+                self._stream.close()
+                self._pyaudio.terminate()
+                self._stream = None
+                self._pyaudio = None
@@ -8,13 +8,319 @@ this module buffers audio chunks and processes them in batches.
 
 import os
 import asyncio
+import bisect
+import hashlib
 import logging
+import struct
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from io import BytesIO
 from typing import Optional, Callable
-import tempfile
-import wave
+
+import httpx
+import numpy as np
 from elevenlabs.client import ElevenLabs
-import subprocess
+
+
+# Dedicated pool for blocking STT work (network calls, decoding), sized well above
+# the default executor so concurrent sessions don't queue behind each other
+STT_WORKERS = int(os.getenv("STT_WORKERS", "64"))
+STT_EXECUTOR = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+
+# Single writer thread for transcription logs: appends never queue behind STT
+# requests, and one worker keeps entries in submission order
+LOG_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-log")
+
+# One pooled ElevenLabs client per API key, shared by every processor
+_clients: dict = {}
+
+
+def get_elevenlabs_client(api_key: str) -> ElevenLabs:
+    """
+    Return a shared ElevenLabs client whose keep-alive pool matches the STT executor.
+    """
+    client = _clients.get(api_key)
+    if client is None:
+        transport = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=STT_WORKERS, max_keepalive_connections=STT_WORKERS),
+            retries=2,
+        )
+        http_client = httpx.Client(transport=transport, timeout=30.0)
+        client = ElevenLabs(api_key=api_key, httpx_client=http_client)
+        _clients[api_key] = client
+    return client
+
+
+# Upper bound on in-flight ElevenLabs requests per event loop, to stay under the tier's rate limit
+ELEVENLABS_CONCURRENCY = int(os.getenv("ELEVENLABS_QPS", "10"))
+
+# One request semaphore per event loop, shared by every batcher on that loop
+_api_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _api_semaphore() -> asyncio.Semaphore:
+    """Return the ElevenLabs request semaphore for the running event loop."""
+    loop = asyncio.get_running_loop()
+    sem = _api_semaphores.get(loop)
+    if sem is None:
+        sem = _api_semaphores[loop] = asyncio.Semaphore(ELEVENLABS_CONCURRENCY)
+    return sem
+
+
+MAX_BATCH = 16  # Most windows coalesced into one STT request
+BATCH_GAP_SECONDS = 0.5  # Silence inserted between windows so words don't straddle them
+# How far (in seconds) a word's timing may spill past its window into the gap before
+# the split is considered unreliable and the windows are transcribed individually
+BATCH_SPLIT_TOLERANCE = BATCH_GAP_SECONDS / 4
+
+ENERGY_FRAME_SECONDS = 0.01  # 10 ms analysis frames for the energy gate
+ENERGY_RMS_THRESHOLD = 300.0  # int16 RMS above which a frame counts as voiced
+MIN_VOICED_FRAMES = 10  # Voiced frames (100 ms) needed before a window is sent for STT
+
+
+def _extract_text(result) -> str:
+    """Extract the transcript text from an ElevenLabs STT result."""
+    if hasattr(result, "text"):
+        return result.text
+    elif isinstance(result, str):
+        return result
+    else:
+        logging.getLogger(__name__).warning(f"Unexpected transcription result format: {type(result)}")
+        return str(result)
+
+
+class TranscriptionBatcher:
+    """
+    Coalesces one session's pending PCM windows into a single STT request.
+
+    Requests go out one at a time; windows queued while a request is in flight
+    are sent together in the next one, so batches only form when STT falls
+    behind the audio. Windows are laid end to end, separated by a short silence
+    gap, in one WAV file. The word timestamps in the result are then used to
+    split the text back out per window. If the request fails, or any word's
+    timing is missing or strays across a gap, the windows are transcribed one
+    request each instead.
+    """
+
+    def __init__(
+        self,
+        client: ElevenLabs,
+        sample_rate: int,
+        sample_width: int,
+        channels: int,
+        max_batch: int = MAX_BATCH,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            client: ElevenLabs client used for the STT requests.
+            sample_rate: Audio sample rate in Hz.
+            sample_width: Sample width in bytes.
+            channels: Number of audio channels.
+            max_batch: Maximum number of windows per request.
+        """
+        self.client = client
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.max_batch = max_batch
+        self.bytes_per_second = sample_rate * sample_width * channels
+
+        # 44-byte PCM WAV header; only the two size fields change per request
+        self._wav_header_template = struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF",
+            0,
+            b"WAVE",
+            b"fmt ",
+            16,
+            1,  # PCM
+            channels,
+            sample_rate,
+            self.bytes_per_second,
+            channels * sample_width,
+            sample_width * 8,
+            b"data",
+            0,
+        )
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, pcm_data: bytes) -> asyncio.Future:
+        """
+        Queue a PCM window for transcription without waiting for it.
+
+        Args:
+            pcm_data: Raw PCM bytes for one window. Must not be modified
+                afterwards, since it is read when the batch is sent.
+
+        Returns:
+            Future resolving to the transcribed text, or None if transcription failed.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # (Re)bind to the current event loop
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+        future = loop.create_future()
+        self._queue.put_nowait((pcm_data, future))
+        return future
+
+    async def transcribe(self, pcm_data: bytes) -> Optional[str]:
+        """Queue a PCM window and wait for its transcription."""
+        return await self.submit(pcm_data)
+
+    def close(self):
+        """Stop the batching task; windows still queued resolve to None."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        if self._queue is not None:
+            while True:
+                try:
+                    _, future = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if not future.done():
+                    future.set_result(None)
+
+    async def _run(self):
+        """Send queued windows one request at a time, up to max_batch windows per request."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            # Wait for this request before taking the next batch, so windows that
+            # arrive meanwhile are coalesced rather than sent one by one
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: list):
+        """Transcribe one batch and resolve each window's future."""
+        texts = None
+        try:
+            texts = await self._transcribe_batch([pcm for pcm, _ in batch])
+        except Exception as e:
+            self.logger.error(f"Error transcribing batch of {len(batch)} windows: {e}")
+        finally:
+            # Callers wait on these futures, so resolve every one even on failure or cancellation
+            if texts is None:
+                texts = [None] * len(batch)
+            for (_, future), text in zip(batch, texts, strict=True):
+                if not future.done():
+                    future.set_result(text)
+
+    async def _transcribe_one(self, pcm_data: bytes | memoryview) -> Optional[str]:
+        """Transcribe a single window, returning None if the request fails."""
+        try:
+            return _extract_text(await self._convert(pcm_data))
+        except Exception as e:
+            self.logger.error(f"Error transcribing audio: {e}")
+            return None
+
+    async def _transcribe_individually(self, windows: list) -> list:
+        """Fallback: one request per window, so a failure only affects its own window."""
+        return list(await asyncio.gather(*(self._transcribe_one(pcm) for pcm in windows)))
+
+    async def _transcribe_batch(self, windows: list) -> list:
+        """Transcribe a list of PCM windows with a single request where possible."""
+        if len(windows) == 1:
+            return [await self._transcribe_one(windows[0])]
+
+        gap = bytes(int(BATCH_GAP_SECONDS * self.sample_rate) * self.sample_width * self.channels)
+        starts = []
+        ends = []
+        position = 0
+        for pcm in windows:
+            starts.append(position / self.bytes_per_second)
+            ends.append((position + len(pcm)) / self.bytes_per_second)
+            position += len(pcm) + len(gap)
+
+        try:
+            result = await self._convert(gap.join(windows))
+        except Exception as e:
+            self.logger.warning(f"Batched transcription failed ({e}); retrying windows individually")
+            return await self._transcribe_individually(windows)
+
+        words = getattr(result, "words", None)
+        if not words:
+            # No timestamps to split on
+            self.logger.warning("Batched transcription has no word timings; retrying windows individually")
+            return await self._transcribe_individually(windows)
+
+        parts = self._split_words(words, starts, ends)
+        if parts is None:
+            self.logger.warning("Batched word timings are missing or cross windows; retrying windows individually")
+            return await self._transcribe_individually(windows)
+
+        self.logger.info(f"Transcribed {len(windows)} windows in one request")
+        return [" ".join(words_in_window) for words_in_window in parts]
+
+    @staticmethod
+    def _split_words(words, starts: list, ends: list) -> Optional[list]:
+        """
+        Assign each word to the window its timing falls in.
+
+        Returns None if any word has no start time, lies in a gap or spans two
+        windows, since the text could then be attributed to the wrong window.
+        """
+        parts = [[] for _ in starts]
+        for word in words:
+            if getattr(word, "type", "word") != "word":
+                continue
+            word_start = getattr(word, "start", None)
+            if word_start is None:
+                return None  # Untimed word: no way to tell which window it belongs to
+            word_end = getattr(word, "end", None)
+            if word_end is None:
+                word_end = word_start
+
+            index = max(bisect.bisect_right(starts, word_start + BATCH_SPLIT_TOLERANCE) - 1, 0)
+            if (
+                word_start < starts[index] - BATCH_SPLIT_TOLERANCE
+                or word_end > ends[index] + BATCH_SPLIT_TOLERANCE
+            ):
+                return None
+            parts[index].append(word.text)
+        return parts
+
+    def _to_wav(self, pcm_data: bytes | memoryview) -> bytes:
+        """Prefix raw PCM bytes with a RIFF/WAVE header."""
+        header = bytearray(self._wav_header_template)
+        struct.pack_into("<I", header, 4, 36 + len(pcm_data))  # RIFF chunk size
+        struct.pack_into("<I", header, 40, len(pcm_data))  # data chunk size
+        return b"".join((header, pcm_data))
+
+    async def _convert(self, pcm_data: bytes | memoryview):
+        """Send one PCM payload to ElevenLabs and return the raw result."""
+        wav_data = self._to_wav(pcm_data)
+
+        def sync_transcribe():
+            audio_file = BytesIO(wav_data)
+            audio_file.name = "audio.wav"
+            return self.client.speech_to_text.convert(
+                file=audio_file,
+                model_id="scribe_v1",
+                language_code="eng",  # You can make this configurable
+            )
+
+        # Run the synchronous API call in a thread pool, capped to avoid 429 retry storms
+        loop = asyncio.get_running_loop()
+        async with _api_semaphore():
+            return await loop.run_in_executor(STT_EXECUTOR, sync_transcribe)
 
 
 class SpeechToTextProcessor:
@@ -33,6 +339,7 @@ class SpeechToTextProcessor:
         channels: int = 1,
         sample_width: int = 2,
         log_file_path: str = "transcription_log.txt",
+        input_format: str = "webm",
     ):
         """
         Initialize the Speech-to-Text processor.
@@ -44,22 +351,41 @@ class SpeechToTextProcessor:
             channels: Number of audio channels.
             sample_width: Sample width in bytes (2 for 16-bit audio).
             log_file_path: Path to log file for transcriptions.
+            input_format: "webm" for browser MediaRecorder chunks, "pcm" for raw
+                16-bit PCM in the configured sample format.
         """
+        if input_format not in ("webm", "pcm"):
+            raise ValueError(f"Unsupported input_format: {input_format!r}. Use 'webm' or 'pcm'.")
+
         self.api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
         if not self.api_key:
             raise ValueError("ElevenLabs API key not provided. Set ELEVENLABS_API_KEY environment variable.")
 
-        self.client = ElevenLabs(api_key=self.api_key)
+        self.client = get_elevenlabs_client(self.api_key)
         self.buffer_duration = buffer_duration
         self.sample_rate = sample_rate
         self.channels = channels
         self.sample_width = sample_width
         self.log_file_path = log_file_path
+        self.input_format = input_format
 
-        # Audio buffer
-        self.audio_buffer = BytesIO()
+        # Windows are queued rather than awaited, so ones that pile up behind a
+        # slow request are sent together
+        self._batcher = TranscriptionBatcher(self.client, sample_rate, sample_width, channels)
+
+        # Futures for queued windows, delivered to the callback in order by _deliver_results
+        self._results: Optional[asyncio.Queue] = None
+        self._delivery_task: Optional[asyncio.Task] = None
+
+        # Audio buffer, pre-sized for one batch (with headroom) and reused across batches
+        self._buffer_capacity = int(sample_rate * channels * sample_width * buffer_duration * 1.25)
+        self.audio_buffer = bytearray(self._buffer_capacity)
+        self._buffer_pos = 0
         self.buffer_start_time = None
 
+        # Digest of the last window sent for transcription
+        self._last_digest: Optional[bytes] = None
+
         # Callbacks
         self.transcription_callback: Optional[Callable[[str], None]] = None
 
@@ -70,46 +396,64 @@ class SpeechToTextProcessor:
         """Set a callback function to be called when transcription is available."""
         self.transcription_callback = callback
 
-    async def add_audio_chunk(self, audio_data: bytes):
+    async def add_audio_chunk(self, audio_data: bytes | memoryview):
         """
         Add an audio chunk to the buffer for processing.
 
         Args:
-            audio_data: WebM audio chunk bytes (typically 100ms).
+            audio_data: WebM or raw PCM audio chunk bytes (typically 100ms),
+                according to `input_format`. The data is copied into the
+                internal buffer, so callers may reuse a memoryview's backing store.
         """
+        current_time = asyncio.get_running_loop().time()
         if self.buffer_start_time is None:
-            self.buffer_start_time = asyncio.get_event_loop().time()
-
-        self.audio_buffer.write(audio_data)
+            self.buffer_start_time = current_time
+
+        n = len(audio_data)
+        end = self._buffer_pos + n
+        if end > self._buffer_capacity:
+            # Grow geometrically so oversized batches don't regrow on every chunk
+            growth = max(n, self._buffer_capacity)
+            self.audio_buffer.extend(bytes(growth))
+            self._buffer_capacity += growth
+        self.audio_buffer[self._buffer_pos:end] = audio_data
+        self._buffer_pos = end
 
         # Check if buffer duration has been reached
-        current_time = asyncio.get_event_loop().time()
         if current_time - self.buffer_start_time >= self.buffer_duration:
+            await self._process_pending()
+
+    async def _process_pending(self):
+        """Transcribe the buffered audio using the strategy for `input_format`."""
+        if self.input_format == "pcm":
+            await self._process_buffer()
+        else:
             await self._process_buffer_as_webm()
 
     async def _process_buffer_as_webm(self):
         """Process the current audio buffer as WebM data and transcribe it."""
-        if self.audio_buffer.tell() == 0:
+        if self._buffer_pos == 0:
             return  # No data in buffer
 
         try:
-            # Get buffered WebM data
-            self.audio_buffer.seek(0)
-            webm_data = self.audio_buffer.read()
-            self.logger.info(f"Processing buffered WebM data: {len(webm_data)} bytes")
+            # View the buffered WebM data without copying it
+            with memoryview(self.audio_buffer)[: self._buffer_pos] as webm_data:
+                self.logger.info(f"Processing buffered WebM data: {len(webm_data)} bytes")
 
-            # Process the buffered data
-            await self._process_webm_batch(webm_data)
+                # Process the buffered data
+                await self._process_webm_batch(webm_data)
 
         except Exception as e:
             self.logger.error(f"Error processing WebM buffer: {e}")
         finally:
-            # Reset buffer
-            self.audio_buffer.seek(0)
-            self.audio_buffer.truncate(0)
-            self.buffer_start_time = None
+            self._reset_buffer()
+
+    def _reset_buffer(self):
+        """Rewind the write cursor so the same buffer is reused for the next batch."""
+        self._buffer_pos = 0
+        self.buffer_start_time = None
 
-    async def _process_webm_batch(self, webm_data: bytes):
+    async def _process_webm_batch(self, webm_data: bytes | memoryview):
         """
         Process a complete WebM audio batch for transcription.
 
@@ -121,160 +465,140 @@ class SpeechToTextProcessor:
             return
 
         try:
-            self.logger.info("Converting WebM batch to WAV for ElevenLabs...")
+            self.logger.info("Decoding WebM batch to PCM for ElevenLabs...")
 
-            # Create temporary files
-            with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as webm_file:
-                webm_path = webm_file.name
-                webm_file.write(webm_data)
+            # Decode WebM to raw PCM in memory
+            pcm_data = await self._decode_webm(webm_data)
 
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as wav_file:
-                wav_path = wav_file.name
-
-            # Convert WebM to WAV using ffmpeg
-            success = await self._convert_webm_to_wav(webm_path, wav_path)
-
-            if success:
-                # Transcribe the converted WAV file
-                transcription = await self._transcribe_file(wav_path)
-
-                if transcription and transcription.strip():
-                    self.logger.info(f"Transcription successful: '{transcription}'")
-                    await self._handle_transcription(transcription)
-                else:
-                    self.logger.warning("No transcription returned or empty result")
+            if pcm_data:
+                # Queue the decoded PCM for transcription
+                self._submit_pcm(pcm_data)
             else:
-                self.logger.error("Failed to convert WebM to WAV")
-
-            # Clean up temp files
-            try:
-                os.unlink(webm_path)
-                os.unlink(wav_path)
-            except:
-                pass
+                self.logger.error("Failed to decode WebM to PCM")
 
         except Exception as e:
             self.logger.error(f"Error processing WebM batch: {e}")
 
-    async def _convert_webm_to_wav(self, webm_path: str, wav_path: str) -> bool:
+    async def _decode_webm(self, webm_data: bytes) -> Optional[bytes]:
         """
-        Convert WebM file to WAV format using ffmpeg.
+        Decode WebM data to raw PCM using ffmpeg over stdin/stdout.
 
         Args:
-            webm_path: Path to input WebM file
-            wav_path: Path to output WAV file
+            webm_data: Input WebM audio bytes
 
         Returns:
-            True if conversion successful, False otherwise
+            Raw PCM bytes if conversion successful, None otherwise
         """
         try:
-            # Use ffmpeg to convert WebM to WAV with specific settings for ElevenLabs
+            # Use ffmpeg to decode WebM with specific settings for ElevenLabs
             cmd = [
                 "ffmpeg",
                 "-i",
-                webm_path,
+                "pipe:0",  # read WebM from stdin
                 "-ar",
-                "16000",  # 16kHz sample rate
+                str(self.sample_rate),
                 "-ac",
                 "1",  # mono channel
-                "-y",  # overwrite output file
-                wav_path,
+                "-f",
+                "s16le",  # raw 16-bit little-endian PCM
+                "pipe:1",  # write PCM to stdout
             ]
 
             self.logger.info(f"Running ffmpeg conversion: {' '.join(cmd)}")
 
-            # Run ffmpeg conversion
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, lambda: subprocess.run(cmd, capture_output=True, text=True))
-
-            if result.returncode == 0:
-                self.logger.info("WebM to WAV conversion successful")
-                return True
+            # Run ffmpeg as a child process with pipes managed by the event loop
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            pcm_data, stderr = await proc.communicate(webm_data)
+
+            if proc.returncode == 0:
+                self.logger.info("WebM to PCM conversion successful")
+                return pcm_data
             else:
-                self.logger.error(f"ffmpeg failed: {result.stderr}")
-                return False
+                self.logger.error(f"ffmpeg failed: {stderr.decode(errors='replace')}")
+                return None
 
         except FileNotFoundError:
-            self.logger.error("ffmpeg not found. Please install ffmpeg to convert WebM to WAV")
-            return False
+            self.logger.error("ffmpeg not found. Please install ffmpeg to convert WebM audio")
+            return None
         except Exception as e:
-            self.logger.error(f"Error converting WebM to WAV: {e}")
-            return False
+            self.logger.error(f"Error converting WebM to PCM: {e}")
+            return None
 
     async def _process_buffer(self):
         """Process the current audio buffer and transcribe it."""
-        if self.audio_buffer.tell() == 0:
+        if self._buffer_pos == 0:
             return  # No data in buffer
 
         try:
-            # Get audio data from buffer
-            self.audio_buffer.seek(0)
-            audio_data = self.audio_buffer.read()
-
-            # Create a temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_path = temp_file.name
-
-                # Write WAV file
-                with wave.open(temp_path, "wb") as wav_file:
-                    wav_file.setnchannels(self.channels)
-                    wav_file.setsampwidth(self.sample_width)
-                    wav_file.setframerate(self.sample_rate)
-                    wav_file.writeframes(audio_data)
-
-            # Transcribe using ElevenLabs
-            transcription = await self._transcribe_file(temp_path)
-
-            if transcription and transcription.strip():
-                await self._handle_transcription(transcription)
-
-            # Clean up temp file
-            os.unlink(temp_path)
+            # View audio data in the buffer without copying it
+            with memoryview(self.audio_buffer)[: self._buffer_pos] as audio_data:
+                # Queue for transcription using ElevenLabs
+                self._submit_pcm(audio_data)
 
         except Exception as e:
             self.logger.error(f"Error processing audio buffer: {e}")
         finally:
-            # Reset buffer
-            self.audio_buffer.seek(0)
-            self.audio_buffer.truncate(0)
-            self.buffer_start_time = None
+            self._reset_buffer()
 
-    async def _transcribe_file(self, file_path: str) -> Optional[str]:
+    def _has_speech(self, pcm_data: bytes | memoryview) -> bool:
+        """Cheap energy VAD: True if enough 10 ms frames exceed the RMS threshold."""
+        if self.sample_width != 2:
+            return True  # Gate is tuned for 16-bit audio only
+
+        frame_samples = int(self.sample_rate * ENERGY_FRAME_SECONDS) * self.channels
+        samples = np.frombuffer(pcm_data, dtype=np.int16)
+        usable = len(samples) - len(samples) % frame_samples
+        if usable == 0:
+            return False
+
+        frames = samples[:usable].reshape(-1, frame_samples).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return int(np.count_nonzero(rms > ENERGY_RMS_THRESHOLD)) >= MIN_VOICED_FRAMES
+
+    def _submit_pcm(self, pcm_data: bytes | memoryview):
         """
-        Transcribe an audio file using ElevenLabs STT API.
+        Queue raw PCM for transcription via this processor's batcher.
 
         Args:
-            file_path: Path to the audio file to transcribe.
-
-        Returns:
-            Transcribed text or None if transcription failed.
+            pcm_data: Raw PCM bytes in the processor's sample format. Copied
+                before queueing, so a view of the reusable buffer is fine.
         """
-        try:
-            # Run the synchronous API call in a thread pool
-            loop = asyncio.get_event_loop()
-
-            def sync_transcribe():
-                with open(file_path, "rb") as audio_file:
-                    return self.client.speech_to_text.convert(
-                        file=audio_file,
-                        model_id="scribe_v1",
-                        language_code="eng",  # You can make this configurable
-                    )
-
-            result = await loop.run_in_executor(None, sync_transcribe)
-
-            # Extract text from the result
-            if hasattr(result, "text"):
-                return result.text
-            elif isinstance(result, str):
-                return result
-            else:
-                self.logger.warning(f"Unexpected transcription result format: {type(result)}")
-                return str(result)
+        if not self._has_speech(pcm_data):
+            self.logger.info("Skipping STT for silent window")
+            return
 
-        except Exception as e:
-            self.logger.error(f"Error transcribing audio: {e}")
-            return None
+        # Byte-identical consecutive windows would only repeat the last transcription
+        digest = hashlib.blake2b(pcm_data, digest_size=8).digest()
+        if digest == self._last_digest:
+            self.logger.info("Skipping STT for window identical to the previous one")
+            return
+        self._last_digest = digest
+
+        if self._delivery_task is None or self._delivery_task.done():
+            self._results = asyncio.Queue()
+            self._delivery_task = asyncio.get_running_loop().create_task(self._deliver_results())
+        self._results.put_nowait(self._batcher.submit(bytes(pcm_data)))
+
+    async def _deliver_results(self):
+        """Hand transcriptions to the callback in the order their windows were queued."""
+        while True:
+            future = await self._results.get()
+            try:
+                transcription = await future
+                if transcription and transcription.strip():
+                    self.logger.info(f"Transcription successful: '{transcription}'")
+                    await self._handle_transcription(transcription)
+                else:
+                    self.logger.warning("No transcription returned or empty result")
+            except Exception as e:
+                self.logger.error(f"Error delivering transcription: {e}")
+            finally:
+                self._results.task_done()
 
     async def _handle_transcription(self, transcription: str):
         """Handle a completed transcription."""
@@ -290,19 +614,37 @@ class SpeechToTextProcessor:
     async def _log_transcription(self, transcription: str):
         """Log transcription to file."""
         try:
-            import datetime
-
-            timestamp = datetime.datetime.now().isoformat()
+            timestamp = datetime.now().isoformat()
             log_entry = f"[{timestamp}] {transcription}\n"
 
-            # Append to log file
-            with open(self.log_file_path, "a", encoding="utf-8") as f:
-                f.write(log_entry)
+            # Hand the append to the log writer thread without waiting on the disk
+            future = LOG_EXECUTOR.submit(self._append_to_log, log_entry)
+            future.add_done_callback(self._on_log_written)
 
         except Exception as e:
             self.logger.error(f"Error logging transcription: {e}")
 
+    def _append_to_log(self, log_entry: str):
+        """Blocking append of one entry to the log file."""
+        with open(self.log_file_path, "a", encoding="utf-8") as f:
+            f.write(log_entry)
+
+    def _on_log_written(self, future):
+        """Report append failures from the log writer thread."""
+        error = future.exception()
+        if error is not None:
+            self.logger.error(f"Error logging transcription: {error}")
+
+    def close(self):
+        """Stop this processor's batcher and result delivery."""
+        self._batcher.close()
+        if self._delivery_task is not None:
+            self._delivery_task.cancel()
+            self._delivery_task = None
+
     async def flush_buffer(self):
-        """Process any remaining audio in the buffer."""
-        if self.audio_buffer.tell() > 0:
-            await self._process_buffer_as_webm()
+        """Process any remaining audio in the buffer and wait for queued transcriptions."""
+        if self._buffer_pos > 0:
+            await self._process_pending()
+        if self._results is not None:
+            await self._results.join()
@@ -14,21 +14,17 @@ To use this example:
 import asyncio
 import websockets
 import json
-import struct
-import math
+
+import numpy as np
 
 
 def generate_test_audio(duration=5.0, frequency=440, sample_rate=16000):
     """Generate a simple sine wave audio for testing."""
-    num_samples = int(duration * sample_rate)
-    audio_data = []
-
-    for i in range(num_samples):
-        # Generate sine wave
-        sample = int(16000 * math.sin(2 * math.pi * frequency * i / sample_rate))
-        audio_data.append(struct.pack('<h', sample))
+    t = np.arange(int(duration * sample_rate), dtype=np.float64)
 
-    return b''.join(audio_data)
+    # Generate sine wave as little-endian 16-bit PCM in one vectorised pass
+    samples = 16000 * np.sin(2 * np.pi * frequency * t / sample_rate)
+    return samples.astype('<i2').tobytes()
 
 
 async def websocket_client_example():
@@ -6,33 +6,336 @@ The server exposes a WebSocket endpoint at `/ws` that accepts a connection
 from a client. It is designed to receive an initial message containing a text
 prompt and a duration, followed by a continuous stream of audio data.
 
-In response, the server sends back a boolean indicating if there is a pause
-in the audio and the processed audio stream.
+The audio is transcribed in the background, and an agent monitoring the
+session sends JSON messages back: silence status, its messages to the user,
+and its streamed analysis.
 """
 
 import asyncio
-import base64
+import collections
+import hashlib
 import json
 import logging
+import logging.handlers
 import os
-import time
+import platform
 import random
-import threading
 import time
+import weakref
+from contextlib import asynccontextmanager
 from speech_to_text_module import SpeechToTextProcessor
-from live_vad import LiveVADProcessor
+from live_vad import LiveVADProcessor, SilenceDetector
 
+import httpx
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from openai import OpenAI
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+try:
+    import uvloop
+except ImportError:  # optional dependency (CPython-only) - keep the stdlib loop
+    uvloop = None
+
+# Make uvloop the default for any loop created after import, so runners other
+# than `uvicorn --loop uvloop` (e.g. asyncio.run in scripts and tests) use it too
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+# Configure logging. Records are buffered and written to stderr in batches -
+# on a timer, when the buffer fills, or immediately for warnings and above.
+LOG_FLUSH_INTERVAL = 1.0
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_buffer = logging.handlers.MemoryHandler(
+    capacity=1024, flushLevel=logging.WARNING, target=_log_stream_handler
+)
+logging.basicConfig(level=logging.INFO, handlers=[_log_buffer])
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+async def flush_logs_periodically():
+    """Write out buffered log records so quiet periods still show up promptly."""
+    while True:
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)
+        _log_buffer.flush()
+
+
+# Iterations of the per-chunk paths to run at startup under PyPy, so the JIT
+# has traced them before the first client streams audio
+JIT_WARMUP_ITERATIONS = 2000
+
+
+def warm_up_jit(iterations: int = JIT_WARMUP_ITERATIONS):
+    """Exercise the pure-Python per-hop and per-message paths with synthetic input."""
+    detector = SilenceDetector()
+    message = {"lull_status": {"silence5": False, "silence20": False}, "timestamp": 0.0}
+    for i in range(iterations):
+        # Alternate runs of speech and silence so both flag transitions get traced
+        detector.update((i >> 5) & 1)
+        dumps_json(message)
+
+
+# Strong references to fire-and-forget tasks so they aren't garbage-collected mid-run
+_background_tasks: set[asyncio.Task] = set()
+
+
+def run_in_background(coro) -> asyncio.Task:
+    """Schedule a coroutine that should outlive the current connection handler."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def cleanup_session(
+    stt_processor: SpeechToTextProcessor | None,
+    vad_processor: LiveVADProcessor | None,
+    *,
+    audio_queue: asyncio.Queue | None = None,
+    processing_task: asyncio.Task | None = None,
+    cancel_tasks: tuple = (),
+):
+    """
+    Tear a session down after the endpoint has returned: cancel its agent and
+    writer, let already-received audio reach STT and flush it, and stop the VAD.
+    """
+    for task in cancel_tasks:
+        if task is not None:
+            task.cancel()
+
+    if processing_task is not None:
+        if audio_queue is not None and not processing_task.done():
+            await audio_queue.join()
+        processing_task.cancel()
+
+    if vad_processor is not None:
+        # stop() joins the processing thread, so keep it off the loop
+        await asyncio.to_thread(vad_processor.stop)
+        logger.info("Stopped VAD processor")
+
+    if stt_processor is not None:
+        try:
+            await stt_processor.flush_buffer()
+            logger.info("Flushed remaining audio from speech-to-text buffer")
+        except Exception as e:
+            logger.error(f"Error flushing speech-to-text buffer: {e}")
+        finally:
+            stt_processor.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if platform.python_implementation() == "PyPy":
+        start = time.perf_counter()
+        warm_up_jit()
+        logger.info("JIT warm-up finished in %.2fs", time.perf_counter() - start)
+
+    log_flusher = asyncio.create_task(flush_logs_periodically())
+    try:
+        yield
+    finally:
+        # Let in-flight session cleanups finish before the loop goes away
+        if _background_tasks:
+            await asyncio.gather(*_background_tasks, return_exceptions=True)
+        log_flusher.cancel()
+        _log_buffer.flush()
+
+
+app = FastAPI(lifespan=lifespan)
+
+_OPENAI_CLIENT = None
+
+# Upper bound on concurrent OpenAI requests per event loop, shared by all connections on it
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "16"))
+
+# One request semaphore per event loop, so none is bound to a loop it wasn't created on
+_openai_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _openai_semaphore() -> asyncio.Semaphore:
+    """Return the OpenAI request semaphore for the running event loop."""
+    loop = asyncio.get_running_loop()
+    sem = _openai_semaphores.get(loop)
+    if sem is None:
+        sem = _openai_semaphores[loop] = asyncio.Semaphore(OPENAI_CONCURRENCY)
+    return sem
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return the process-wide OpenAI client so agent turns reuse its connection pool."""
+    global _OPENAI_CLIENT
+    # Only called from the event loop, so no lock is needed around the lazy init
+    if _OPENAI_CLIENT is None:
+        # Uses OPENAI_API_KEY environment variable
+        _OPENAI_CLIENT = AsyncOpenAI(
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            )
+        )
+    return _OPENAI_CLIENT
+
+
+def dumps_json(payload) -> str:
+    """Serialize to a compact JSON string."""
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def loads_json(data: str | bytes):
+    """Parse JSON text."""
+    return json.loads(data)
+
+
+async def send_message(websocket: WebSocket, payload: dict):
+    """Send a control message as a JSON text frame."""
+    # Text frames so browser clients can keep using JSON.parse on event.data
+    await websocket.send_text(dumps_json(payload))
+
+
+async def drain_writer(websocket: WebSocket, out_queue: asyncio.Queue):
+    """
+    Single writer for a connection.
+
+    Waits for the next outbound message, then drains everything else already
+    queued and sends it as one {"batch": [...]} frame so bursts don't turn
+    into many small writes. A lone message is sent unwrapped. Messages without
+    a "timestamp" are stamped here, with one clock read per batch.
+    """
+    while True:
+        batch = [await out_queue.get()]
+        while True:
+            try:
+                batch.append(out_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+        ts = time.time()
+        for message in batch:
+            message.setdefault("timestamp", ts)
+
+        try:
+            await send_message(websocket, batch[0] if len(batch) == 1 else {"batch": batch})
+        except Exception as e:
+            logger.error(f"Error sending {len(batch)} message(s) to websocket: {e}")
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    """Receive a control message sent as a JSON text frame."""
+    return loads_json(await websocket.receive_text())
+
+
+# Audio encodings a client may declare in its initial message
+AUDIO_FORMATS = ("webm", "pcm")
 
 
-def delayed_prompt_sender(prompt: str, websocket: WebSocket, log_file_path: str, vad_processor: LiveVADProcessor, debug: bool = False):
+async def receive_initial_message(websocket: WebSocket) -> tuple[str, int, str] | None:
+    """
+    Receive the session's initial message and return (prompt, duration, format),
+    or None if it is malformed. "format" is optional and defaults to "webm".
+    """
+    try:
+        message = await receive_message(websocket)
+    except (json.JSONDecodeError, KeyError):  # KeyError: a binary frame has no "text"
+        return None
+    if not isinstance(message, dict):
+        return None
+    prompt = message.get("prompt")
+    duration = message.get("duration")
+    input_format = message.get("format", "webm")
+    if not isinstance(prompt, str) or not isinstance(duration, int) or isinstance(duration, bool):
+        return None
+    if input_format not in AUDIO_FORMATS:
+        return None
+    return prompt, duration, input_format
+
+
+# Agent tools definition for OpenAI, shared by every connection
+_AGENT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "read_file",
+            "description": "Read the current content of the transcription log file",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "check_lull",
+            "description": "Check for silence periods in the audio stream. Returns silence5 (.5 + seconds of silence) and silence20 (2 + seconds of silence) flags.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "write_to_ws",
+            "description": "Send a confidence message to the websocket client and automatically clear the transcription file. Should be either 'You are confident' or 'You are not confident' based on transcription analysis.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "message": {
+                        "type": "string",
+                        "description": "The confidence message to send. Should be 'You are confident' or 'You are not confident'"
+                    }
+                },
+                "required": ["message"]
+            }
+        }
+    }
+]
+
+# Agent system prompt; only the per-connection fields are filled in with .format()
+_SYSTEM_PROMPT_TEMPLATE = """You are an AI agent continuously monitoring transcription data. You have access to three tools:
+1. read_file() - Read the current transcription log file content
+2. check_lull() - Check for silence periods (returns silence5 (0.5+ seconds) and silence20 (2+ seconds) flags)
+3. write_to_ws(message) - Send a confidence message to the websocket client (this automatically clears the file)
+
+Your monitoring logic:
+1. CONTINUOUSLY check for silence using check_lull()
+2. WHEN silence5 flag is True (0.5+ seconds of silence):
+   - Read the transcription file 
+   - Analyze the confidence level of the text
+3. WHEN silence20 flag is True (2+ seconds of silence):
+   - Send confidence message using write_to_ws() - either "You are confident" or "You are not confident"
+4. KEEP MONITORING - you may send multiple messages as the conversation continues
+
+Important notes:
+- You run continuously and may send multiple confidence assessments
+- Only read/analyze when silence5 is True (indicates a natural pause)
+- Only send messages when silence20 is True (indicates user is done speaking)
+- When you call write_to_ws(), the transcription file will be automatically cleared
+- Keep looping to monitor ongoing conversation
+
+Base your confidence assessment on:
+- Clarity and coherence of the transcribed text
+- Length and completeness of the transcription
+- Presence of garbled or nonsensical words
+- Overall quality and usefulness of the content
+
+Original user prompt was: "{prompt}"
+File path: {log_file_path}"""
+
+
+async def delayed_prompt_sender(
+    prompt: str,
+    websocket: WebSocket,
+    log_file_path: str,
+    vad_processor: LiveVADProcessor,
+    debug: bool = False,
+    *,
+    out_queue: asyncio.Queue,
+    transcript_buf: collections.deque,
+):
     """
     Agent that sleeps for 10 seconds then uses OpenAI to analyze transcription data.
     Has access to read_file and clear_file tools.
@@ -40,12 +343,18 @@ def delayed_prompt_sender(prompt: str, websocket: WebSocket, log_file_path: str,
     Args:
         prompt (str): The original prompt
         websocket (WebSocket): The WebSocket connection
-        log_file_path (str): Path to the transcription log file
+        log_file_path (str): Path to the on-disk transcription log (reported to the client)
         vad_processor (LiveVADProcessor): The VAD processor for checking silence flags
         debug (bool): If True, read_file returns random content instead of reading actual file
+        out_queue (asyncio.Queue): The connection's outbound queue, drained by its writer task
+        transcript_buf (collections.deque): In-memory transcriptions, appended by the STT callback
     """
+    def send_to_ws(payload: dict):
+        """Hand a payload to the connection's writer task."""
+        out_queue.put_nowait(payload)
+    
     def read_file():
-        """Read content from the log file or return random content if debug mode."""
+        """Read the buffered transcript or return random content if debug mode."""
         if debug:
             # Return random content for debugging
             debug_options = [
@@ -53,31 +362,18 @@ def delayed_prompt_sender(prompt: str, websocket: WebSocket, log_file_path: str,
                 "Um, I'm not sure if this is the right approach. Maybe we should consider other options before moving forward."
             ]
             content = random.choice(debug_options)
-            logger.info(f"Agent read DEBUG content: {content[:50]}...")
+            logger.info("Agent read DEBUG content: %.50s...", content)
             return content
         
-        try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            logger.info(f"Agent read {len(content)} characters from file")
-            return content
-        except FileNotFoundError:
-            logger.warning(f"Log file {log_file_path} not found")
-            return ""
-        except Exception as e:
-            logger.error(f"Error reading file: {e}")
-            return ""
+        content = "\n".join(transcript_buf)
+        logger.info("Agent read %d characters from transcript buffer", len(content))
+        return content
     
     def clear_file():
-        """Clear the content of the log file."""
-        try:
-            with open(log_file_path, 'w', encoding='utf-8') as f:
-                f.write("")
-            logger.info(f"Agent cleared file: {log_file_path}")
-            return True
-        except Exception as e:
-            logger.error(f"Error clearing file: {e}")
-            return False
+        """Clear the in-memory transcript (the on-disk log is kept as history)."""
+        transcript_buf.clear()
+        logger.info("Agent cleared transcript buffer")
+        return True
     
     def check_lull():
         """
@@ -94,7 +390,7 @@ def delayed_prompt_sender(prompt: str, websocket: WebSocket, log_file_path: str,
             "silence20": silence_2000ms  # 2.0+ seconds of silence
         }
         
-        logger.info(f"Lull check result: {result}")
+        logger.debug("Lull check result: %s", result)
         
         # Send lull status to websocket to keep frontend informed
         send_lull_status(result)
@@ -104,17 +400,10 @@ def delayed_prompt_sender(prompt: str, websocket: WebSocket, log_file_path: str,
     def send_lull_status(lull_data: dict):
         """Send lull status to the websocket to keep frontend informed."""
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            status_message = {"lull_status": lull_data}
             
-            status_message = {
-                "lull_status": lull_data,
-                "timestamp": time.time()
-            }
-            
-            loop.run_until_complete(websocket.send_json(status_message))
-            loop.close()
-            logger.info(f"Sent lull status to frontend: {lull_data}")
+            send_to_ws(status_message)
+            logger.debug("Sent lull status to frontend: %s", lull_data)
             return True
         except Exception as e:
             logger.error(f"Error sending lull status to websocket: {e}")
@@ -126,172 +415,116 @@ def delayed_prompt_sender(prompt: str, websocket: WebSocket, log_file_path: str,
             clear_result = clear_file()
             
             # Then send the message
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            ws_message = {
-                "agent_message": message,
-                "timestamp": time.time()
-            }
+            ws_message = {"agent_message": message}
             
-            loop.run_until_complete(websocket.send_json(ws_message))
-            loop.close()
-            logger.info(f"Agent sent message to websocket: {message} (file cleared: {clear_result})")
+            send_to_ws(ws_message)
+            logger.info("Agent sent message to websocket: %s (file cleared: %s)", message, clear_result)
             return True
         except Exception as e:
             logger.error(f"Error sending message to websocket: {e}")
             return False
     
-    # Agent tools definition for OpenAI
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "read_file",
-                "description": "Read the current content of the transcription log file",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "check_lull",
-                "description": "Check for silence periods in the audio stream. Returns silence5 (.5 + seconds of silence) and silence20 (2 + seconds of silence) flags.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "write_to_ws",
-                "description": "Send a confidence message to the websocket client and automatically clear the transcription file. Should be either 'You are confident' or 'You are not confident' based on transcription analysis.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "message": {
-                            "type": "string",
-                            "description": "The confidence message to send. Should be 'You are confident' or 'You are not confident'"
-                        }
-                    },
-                    "required": ["message"]
-                }
-            }
-        }
-    ]
-    
-    time.sleep(4)
+    await asyncio.sleep(4)
     
     try:
         # Initialize OpenAI client
-        client = OpenAI()  # Uses OPENAI_API_KEY environment variable
+        client = get_openai_client()
         
         # Create the agent prompt
-        system_prompt = f"""You are an AI agent continuously monitoring transcription data. You have access to three tools:
-1. read_file() - Read the current transcription log file content
-2. check_lull() - Check for silence periods (returns silence5 (0.5+ seconds) and silence20 (2+ seconds) flags)
-3. write_to_ws(message) - Send a confidence message to the websocket client (this automatically clears the file)
+        system_prompt = _SYSTEM_PROMPT_TEMPLATE.format(prompt=prompt, log_file_path=log_file_path)
 
-Your monitoring logic:
-1. CONTINUOUSLY check for silence using check_lull()
-2. WHEN silence5 flag is True (0.5+ seconds of silence):
-   - Read the transcription file 
-   - Analyze the confidence level of the text
-3. WHEN silence20 flag is True (2+ seconds of silence):
-   - Send confidence message using write_to_ws() - either "You are confident" or "You are not confident"
-4. KEEP MONITORING - you may send multiple messages as the conversation continues
-
-Important notes:
-- You run continuously and may send multiple confidence assessments
-- Only read/analyze when silence5 is True (indicates a natural pause)
-- Only send messages when silence20 is True (indicates user is done speaking)
-- When you call write_to_ws(), the transcription file will be automatically cleared
-- Keep looping to monitor ongoing conversation
-
-Base your confidence assessment on:
-- Clarity and coherence of the transcribed text
-- Length and completeness of the transcription
-- Presence of garbled or nonsensical words
-- Overall quality and usefulness of the content
-
-Original user prompt was: "{prompt}"
-File path: {log_file_path}"""
-
-        # Make the OpenAI call with tools for continuous monitoring
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": "Start continuous monitoring. Check silence flags and respond appropriately based on the monitoring logic."}
-            ],
-            tools=tools,
-            tool_choice="auto"
-        )
-        
-        # Process tool calls if any
-        message = response.choices[0].message
+        content_parts = []
         tool_results = []
+        pending_call = None  # {"index", "name", "arguments"} of the tool call being streamed
+        tool_calls_made = 0
         
-        if message.tool_calls:
-            for tool_call in message.tool_calls:
-                tool_name = tool_call.function.name
-                
-                if tool_name == "read_file":
-                    result = read_file()
-                    tool_results.append({
-                        "tool": "read_file",
-                        "result": result
-                    })
-                elif tool_name == "check_lull":
-                    result = check_lull()
-                    tool_results.append({
-                        "tool": "check_lull",
-                        "result": result
-                    })
-                elif tool_name == "write_to_ws":
-                    # Parse the message argument from the tool call
-                    args = json.loads(tool_call.function.arguments)
-                    message_text = args.get("message", "")
-                    result = write_to_ws(message_text)
-                    tool_results.append({
-                        "tool": "write_to_ws",
-                        "message": message_text,
-                        "result": result,
-                        "file_cleared": True
-                    })
+        def run_tool(tool_call: dict):
+            """Dispatch one fully streamed tool call and record its result."""
+            tool_name = tool_call["name"]
+            
+            if tool_name == "read_file":
+                result = read_file()
+                tool_results.append({
+                    "tool": "read_file",
+                    "result": result
+                })
+            elif tool_name == "check_lull":
+                result = check_lull()
+                tool_results.append({
+                    "tool": "check_lull",
+                    "result": result
+                })
+            elif tool_name == "write_to_ws":
+                # Parse the message argument from the tool call
+                args = loads_json("".join(tool_call["arguments"]) or "{}")
+                message_text = args.get("message", "")
+                result = write_to_ws(message_text)
+                tool_results.append({
+                    "tool": "write_to_ws",
+                    "message": message_text,
+                    "result": result,
+                    "file_cleared": True
+                })
         
-        # Send response back via websocket
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Bound in-flight OpenAI requests across all sessions
+        async with _openai_semaphore():
+            # Stream the completion so text reaches the client as it is generated and
+            # each tool runs as soon as its call has been fully streamed
+            stream = await client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": "Start continuous monitoring. Check silence flags and respond appropriately based on the monitoring logic."}
+                ],
+                tools=_AGENT_TOOLS,
+                tool_choice="auto",
+                stream=True,
+            )
+            
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+            
+                if delta.content:
+                    content_parts.append(delta.content)
+                    send_to_ws({"agent_analysis_delta": {"original_prompt": prompt, "content": delta.content}})
+            
+                for tool_delta in delta.tool_calls or ():
+                    # Tool calls stream one after another; a new index means the previous one is complete
+                    if pending_call is None or tool_delta.index != pending_call["index"]:
+                        if pending_call is not None:
+                            run_tool(pending_call)
+                        pending_call = {"index": tool_delta.index, "name": "", "arguments": []}
+                        tool_calls_made += 1
+                    if tool_delta.function is not None:
+                        if tool_delta.function.name:
+                            pending_call["name"] += tool_delta.function.name
+                        if tool_delta.function.arguments:
+                            pending_call["arguments"].append(tool_delta.function.arguments)
+        
+        if pending_call is not None:
+            run_tool(pending_call)
         
+        # Send response back via websocket
         response_data = {
             "agent_analysis": {
                 "original_prompt": prompt,
                 "file_path": log_file_path,
-                "openai_response": message.content,
-                "tool_calls_made": len(message.tool_calls) if message.tool_calls else 0,
+                "openai_response": "".join(content_parts) or None,
+                "tool_calls_made": tool_calls_made,
                 "tool_results": tool_results,
                 "timestamp": time.time()
             }
         }
         
-        loop.run_until_complete(websocket.send_json(response_data))
-        loop.close()
-        logger.info(f"Agent completed analysis with {len(tool_results)} tool calls")
+        send_to_ws(response_data)
+        logger.info("Agent completed analysis with %d tool calls", len(tool_results))
         
     except Exception as e:
         logger.error(f"Error in agent: {e}")
         # Send error response
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
             error_response = {
                 "agent_error": {
                     "original_prompt": prompt,
@@ -300,8 +533,7 @@ File path: {log_file_path}"""
                     "timestamp": time.time()
                 }
             }
-            loop.run_until_complete(websocket.send_json(error_response))
-            loop.close()
+            send_to_ws(error_response)
         except:
             pass
 
@@ -318,11 +550,20 @@ async def websocket_endpoint(websocket: WebSocket):
 
     The communication protocol is as follows:
     1. Client connects to the WebSocket endpoint.
-    2. Client sends a JSON message with "prompt" (str) and "duration" (int).
+    2. Client sends a JSON message with "prompt" (str) and "duration" (int),
+       and optionally "format": "webm" (default, MediaRecorder chunks) or
+       "pcm" (raw 16 kHz mono 16-bit samples).
     3. Client starts sending audio data as binary messages.
-    4. Server receives audio data and sends back a JSON message with
-       "is_there_a_pause" (bool), the base64-encoded processed audio chunk,
-       and any available transcription text.
+    4. Audio is transcribed in the background; no per-chunk response is sent.
+       The session's agent sends JSON text messages, each keyed by its type:
+       - "lull_status": {"silence5": bool, "silence20": bool}
+       - "agent_message": str, a message for the user
+       - "agent_analysis_delta": {"original_prompt", "content"}, streamed text
+       - "agent_analysis": {"original_prompt", "file_path", "openai_response",
+         "tool_calls_made", "tool_results", "timestamp"}, the final result
+       - "agent_error": {"original_prompt", "file_path", "error", "timestamp"}
+       Every message carries a "timestamp". Messages that queue up while a
+       send is in flight are delivered together as {"batch": [...]}.
 
     Args:
         websocket (WebSocket): The WebSocket connection object.
@@ -330,23 +571,34 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("WebSocket connection accepted.")
 
+    # Bound before the try so the exception handlers can check them directly
+    stt_processor = None
+    vad_processor = None
+    audio_queue = None
+    processing_task = agent_task = writer_task = None
+    batch_counter = 0
+
     try:
         # Receive the initial message with prompt and duration
-        initial_message = await websocket.receive_json()
-        prompt = initial_message.get("prompt")
-        duration = initial_message.get("duration")
-        logger.info(f"Received initial message with prompt: '{prompt}' and duration: {duration}s")
-
-        if not isinstance(prompt, str) or not isinstance(duration, int):
+        initial_message = await receive_initial_message(websocket)
+        if initial_message is None:
             await websocket.close(code=1003, reason="Invalid initial message format")
             logger.warning("Invalid initial message format. Closing connection.")
             return
 
+        prompt, duration, input_format = initial_message
+        logger.info(
+            "Received initial message with prompt: '%s', duration: %ss, format: %s", prompt, duration, input_format
+        )
+
         # Initialize speech-to-text processor
-        log_file_path = f"transcription_log_{prompt.replace(' ', '_')}.txt"
+        # Short stable id so arbitrary prompts can't produce over-long or unsafe file names
+        log_id = hashlib.blake2b(prompt.encode(), digest_size=8).hexdigest()
+        log_file_path = f"transcription_log_{log_id}.txt"
         stt_processor = SpeechToTextProcessor(
             buffer_duration=1.0,  # Process audio every 1 second
-            log_file_path=log_file_path
+            log_file_path=log_file_path,
+            input_format=input_format,
         )
 
         # Initialize VAD processor for silence detection
@@ -361,93 +613,153 @@ async def websocket_endpoint(websocket: WebSocket):
         # Check for debug mode (can be set via environment variable)
         debug_mode = True
         if debug_mode:
-            logger.info("🐛 DEBUG MODE")
+            logger.info("DEBUG MODE: agent reads canned transcripts")
         
-        # Start the delayed prompt sender thread (agent)
-        agent_thread = threading.Thread(
-            target=delayed_prompt_sender,
-            args=(prompt, websocket, log_file_path, vad_processor, debug_mode),
-            daemon=True
+        # Transcriptions are kept in memory for the agent instead of re-reading the log file
+        transcript_buf: collections.deque = collections.deque(maxlen=4096)
+
+        # All outbound messages go through one writer task that coalesces bursts
+        out_queue: asyncio.Queue = asyncio.Queue()
+        writer_task = asyncio.create_task(drain_writer(websocket, out_queue))
+
+        # Start the delayed prompt sender (agent) on this loop
+        agent_task = asyncio.create_task(
+            delayed_prompt_sender(
+                prompt,
+                websocket,
+                log_file_path,
+                vad_processor,
+                debug_mode,
+                out_queue=out_queue,
+                transcript_buf=transcript_buf,
+            )
         )
-        agent_thread.start()
-        logger.info("Started delayed prompt sender agent thread")
-
-        batch_counter = 0
-
-        # Set up transcription callback and accumulated transcript
-        latest_transcription = {"text": ""}
-        accumulated_transcript = []
-
-        # Random pause timing
-        last_pause_time = time.time()
-        next_pause_interval = random.uniform(5, 15)  # Random between 5-15 seconds
+        logger.info("Started delayed prompt sender agent task")
 
+        # Transcriptions only need to reach the agent's bounded buffer
         def transcription_callback(text: str):
-            latest_transcription["text"] = text
             if text.strip():
-                accumulated_transcript.append(text)
-            logger.info(f"New transcription available: {text}")
+                transcript_buf.append(text)
+            logger.info("New transcription available: %s", text)
 
         stt_processor.set_transcription_callback(transcription_callback)
 
-        # Start the delayed prompt sender thread
-        prompt_thread = threading.Thread(
-            target=delayed_prompt_sender,
-            args=(prompt, websocket, log_file_path),
-            daemon=True
-        )
-        prompt_thread.start()
-        logger.info("Started delayed prompt sender thread")
-
-        # Loop to process audio stream
+        # Hand audio from the receive loop to a separate processing task so a
+        # slow STT batch never stalls reading from the socket
+        audio_queue: asyncio.Queue = asyncio.Queue(maxsize=32)
+
+        # On overrun, raw PCM drops the oldest chunk so the receive loop never waits.
+        # WebM chunks are fragments of one container stream and can't be dropped
+        # without corrupting it, so they apply backpressure to the socket instead.
+        drop_on_overrun = input_format == "pcm"
+        dropped_chunks = 0
+
+        # Reused slab for coalesced chunks, grown only if a backlog outgrows it
+        coalesce_buf = bytearray(64 * 1024)
+
+        async def process_audio():
+            while True:
+                # Coalesce whatever arrived while the last call was running into one STT call
+                chunks = [await audio_queue.get()]
+                while True:
+                    try:
+                        chunks.append(audio_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                try:
+                    # Process the audio for speech-to-text
+                    if len(chunks) == 1:
+                        await stt_processor.add_audio_chunk(chunks[0])
+                    else:
+                        total = sum(map(len, chunks))
+                        if total > len(coalesce_buf):
+                            coalesce_buf.extend(bytes(total - len(coalesce_buf)))
+                        pos = 0
+                        for chunk in chunks:
+                            end = pos + len(chunk)
+                            coalesce_buf[pos:end] = chunk
+                            pos = end
+                        # The processor copies into its own buffer, so a view of the slab is enough
+                        with memoryview(coalesce_buf)[:pos] as audio_view:
+                            await stt_processor.add_audio_chunk(audio_view)
+                except Exception as e:
+                    logger.error(f"Error processing audio data: {e}")
+                finally:
+                    for _ in chunks:
+                        audio_queue.task_done()
+
+        processing_task = asyncio.create_task(process_audio())
+
+        # Loop to receive audio stream. Any receive error (e.g. a text frame, which makes
+        # receive_bytes raise) ends the session through the handlers below.
         while True:
-            try:
-                # Receive 100ms audio chunk from the client
-                audio_chunk = await asyncio.wait_for(
-                    websocket.receive_bytes(),
-                    timeout=5.0,  # 5 second timeout for 100ms chunks
-                )
+            # Receive 100ms audio chunk from the client. Dead peers are detected by the
+            # server's protocol-level ping/pong, so no per-receive timeout is needed.
+            audio_chunk = await websocket.receive_bytes()
 
-                batch_counter += 1
-                logger.info(f"Received audio chunk #{batch_counter}: {len(audio_chunk)} bytes")
+            batch_counter += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Received audio chunk #%d: %d bytes", batch_counter, len(audio_chunk))
 
-                # Process the audio chunk for speech-to-text
-                await stt_processor.add_audio_chunk(audio_chunk)
+            if drop_on_overrun and audio_queue.full():
+                # Raw PCM tolerates gaps: drop the oldest chunk to keep latency bounded
+                audio_queue.get_nowait()
+                audio_queue.task_done()
+                dropped_chunks += 1
+                logger.warning("STT fell behind; dropped %d audio chunk(s) so far", dropped_chunks)
 
-            except asyncio.TimeoutError:
-                logger.info("Timeout waiting for audio chunk - client may have paused")
-                response_data = {"status": "waiting", "message": "Waiting for audio..."}
-                await websocket.send_json(response_data)
-
-            except Exception as e:
-                logger.error(f"Error processing audio data: {e}")
-                break
+            # Blocks only when the processor falls a full queue behind (never in drop mode)
+            await audio_queue.put(audio_chunk)
 
     except WebSocketDisconnect:
-        logger.info(f"Client disconnected. Processed {batch_counter} audio batches total.")
-
-        # Flush any remaining audio in the buffer before closing
-        if "stt_processor" in locals():
-            await stt_processor.flush_buffer()
-            logger.info("Flushed remaining audio from speech-to-text buffer")
-        
-        # Stop VAD processor
-        if "vad_processor" in locals():
-            vad_processor.stop()
-            logger.info("Stopped VAD processor")
+        logger.info("Client disconnected. Processed %d audio batches total.", batch_counter)
+
+        # Drain queued audio, flush STT and stop the VAD without holding up the disconnect
+        run_in_background(
+            cleanup_session(
+                stt_processor,
+                vad_processor,
+                audio_queue=audio_queue,
+                processing_task=processing_task,
+                cancel_tasks=(agent_task, writer_task),
+            )
+        )
 
     except Exception as e:
         logger.error(f"An error occurred: {e}")
         logger.info(
-            f"Session summary: Processed {batch_counter if 'batch_counter' in locals() else 0} audio batches before error"
+            "Session summary: Processed %d audio batches before error",
+            batch_counter,
         )
         
-        # Stop VAD processor on error
-        if "vad_processor" in locals():
-            vad_processor.stop()
-            logger.info("Stopped VAD processor due to error")
-
-        # Flush any remaining audio in the buffer before closing
-        if "stt_processor" in locals():
-            await stt_processor.flush_buffer()
+        # Close right away; queued audio, STT and the VAD are handled in the background
+        run_in_background(
+            cleanup_session(
+                stt_processor,
+                vad_processor,
+                audio_queue=audio_queue,
+                processing_task=processing_task,
+                cancel_tasks=(agent_task, writer_task),
+            )
+        )
         await websocket.close(code=1011)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop and the httptools parser (both bundled with uvicorn[standard]) speed up every
+    # await and the upgrade handshake. They are C extensions built for CPython, so under
+    # PyPy the JIT-compiled stdlib loop and the pure-Python h11 parser are used instead.
+    on_cpython = platform.python_implementation() == "CPython"
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8001,
+        loop="uvloop" if on_cpython else "asyncio",
+        http="httptools" if on_cpython else "h11",
+        ws="websockets",
+        # Keepalive for idle clients is handled with WebSocket ping/pong frames
+        ws_ping_interval=20.0,
+        ws_ping_timeout=20.0,
+    )
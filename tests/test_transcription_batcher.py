@@ -0,0 +1,184 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from speech_to_text_module import BATCH_GAP_SECONDS, SpeechToTextProcessor, TranscriptionBatcher  # noqa: E402
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+WINDOW_BYTES = SAMPLE_RATE * SAMPLE_WIDTH  # 1 s per window
+WAV_HEADER_BYTES = 44
+GAP_BYTES = int(BATCH_GAP_SECONDS * SAMPLE_RATE) * SAMPLE_WIDTH
+
+
+def word(text, start, end):
+    return SimpleNamespace(text=text, start=start, end=end, type="word")
+
+
+class FakeSpeechToText:
+    """Stands in for client.speech_to_text; records every request it receives."""
+
+    def __init__(self, batched_result=None, fail_batched=False, fail_windows=(), delay=0.0):
+        self.batched_result = batched_result
+        self.fail_batched = fail_batched
+        self.fail_windows = set(fail_windows)
+        self.delay = delay
+        self.requests = []
+
+    def convert(self, file, model_id, language_code):
+        pcm = file.read()[WAV_HEADER_BYTES:]
+        self.requests.append(len(pcm))
+        time.sleep(self.delay)
+        if len(pcm) == WINDOW_BYTES:
+            # Single window: each test window is filled with its own marker byte
+            if pcm[0] in self.fail_windows:
+                raise RuntimeError("window request failed")
+            return SimpleNamespace(text=f"window {pcm[0]}", words=[])
+        if self.fail_batched:
+            raise RuntimeError("batched request failed")
+        if self.batched_result is not None:
+            return self.batched_result
+        # Time each window's text where it sits in the concatenated audio
+        words = []
+        for offset in range(0, len(pcm), WINDOW_BYTES + GAP_BYTES):
+            start = offset / (SAMPLE_RATE * SAMPLE_WIDTH)
+            words += [word("window", start + 0.1, start + 0.3), word(str(pcm[offset]), start + 0.4, start + 0.6)]
+        return SimpleNamespace(text=" ".join(w.text for w in words), words=words)
+
+
+def make_batcher(fake):
+    client = SimpleNamespace(speech_to_text=fake)
+    return TranscriptionBatcher(client, SAMPLE_RATE, SAMPLE_WIDTH, channels=1)
+
+
+def windows(count, first=1):
+    return [bytes([marker]) * WINDOW_BYTES for marker in range(first, first + count)]
+
+
+def test_batched_words_are_split_at_window_boundaries():
+    # Windows occupy 0-1 s and 1.5-2.5 s; the 0.5 s gap sits between them
+    result = SimpleNamespace(
+        text="hello there world",
+        words=[
+            word("hello", 0.1, 0.4),
+            SimpleNamespace(text=" ", start=0.4, end=0.5, type="spacing"),
+            word("there", 0.5, 1.05),
+            word("world", 1.48, 1.9),
+        ],
+    )
+    fake = FakeSpeechToText(batched_result=result)
+
+    texts = asyncio.run(make_batcher(fake)._transcribe_batch(windows(2)))
+
+    assert texts == ["hello there", "world"]
+    assert len(fake.requests) == 1
+
+
+def test_word_straddling_the_gap_falls_back_to_per_window_requests():
+    result = SimpleNamespace(text="spans both", words=[word("spans", 0.8, 1.6)])
+    fake = FakeSpeechToText(batched_result=result)
+
+    texts = asyncio.run(make_batcher(fake)._transcribe_batch(windows(2)))
+
+    assert texts == ["window 1", "window 2"]
+    assert fake.requests.count(WINDOW_BYTES) == 2
+
+
+def test_word_inside_the_gap_falls_back_to_per_window_requests():
+    result = SimpleNamespace(text="stray", words=[word("stray", 1.2, 1.3)])
+    fake = FakeSpeechToText(batched_result=result)
+
+    texts = asyncio.run(make_batcher(fake)._transcribe_batch(windows(2)))
+
+    assert texts == ["window 1", "window 2"]
+
+
+def test_untimed_word_falls_back_to_per_window_requests():
+    result = SimpleNamespace(text="hello", words=[word("hello", None, None)])
+    fake = FakeSpeechToText(batched_result=result)
+
+    texts = asyncio.run(make_batcher(fake)._transcribe_batch(windows(2)))
+
+    assert texts == ["window 1", "window 2"]
+
+
+def test_missing_word_timings_fall_back_to_per_window_requests():
+    fake = FakeSpeechToText(batched_result=SimpleNamespace(text="no timings", words=None))
+
+    texts = asyncio.run(make_batcher(fake)._transcribe_batch(windows(2)))
+
+    assert texts == ["window 1", "window 2"]
+
+
+def test_failed_batch_only_loses_the_windows_that_fail_alone():
+    fake = FakeSpeechToText(fail_batched=True, fail_windows={2})
+
+    texts = asyncio.run(make_batcher(fake)._transcribe_batch(windows(3)))
+
+    assert texts == ["window 1", None, "window 3"]
+
+
+def test_transcribe_resolves_each_caller_with_its_own_window():
+    fake = FakeSpeechToText(fail_batched=True)
+
+    async def run():
+        batcher = make_batcher(fake)
+        try:
+            return await asyncio.gather(*(batcher.transcribe(pcm) for pcm in windows(3)))
+        finally:
+            batcher.close()
+
+    assert asyncio.run(run()) == ["window 1", "window 2", "window 3"]
+
+
+def test_dispatch_resolves_every_future_when_the_batch_raises():
+    batcher = make_batcher(FakeSpeechToText())
+
+    async def broken_batch(windows):
+        raise TypeError("unexpected result shape")
+
+    batcher._transcribe_batch = broken_batch
+
+    async def run():
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(*(batcher.transcribe(pcm) for pcm in windows(2))), timeout=1
+            )
+        finally:
+            batcher.close()
+
+    assert asyncio.run(run()) == [None, None]
+
+
+def test_processor_batches_windows_queued_behind_a_slow_request(tmp_path):
+    # Marker bytes from 2 up keep the windows above the energy gate
+    fake = FakeSpeechToText(delay=0.2)
+    received = []
+
+    async def run():
+        processor = SpeechToTextProcessor(
+            api_key="test-key",
+            buffer_duration=0.0,  # every chunk is a full window
+            input_format="pcm",
+            log_file_path=str(tmp_path / "transcripts.txt"),
+        )
+        processor._batcher.client = SimpleNamespace(speech_to_text=fake)
+        processor.set_transcription_callback(received.append)
+        try:
+            first, *rest = windows(3, first=2)
+            await processor.add_audio_chunk(first)
+            await asyncio.sleep(0.05)  # first request is now in flight
+            for pcm in rest:
+                await processor.add_audio_chunk(pcm)
+            await processor.flush_buffer()
+        finally:
+            processor.close()
+
+    asyncio.run(run())
+
+    assert fake.requests == [WINDOW_BYTES, 2 * WINDOW_BYTES + GAP_BYTES]
+    assert received == ["window 2", "window 3", "window 4"]